@@ -0,0 +1,99 @@
+"""compute_posteriors를 단순 전수(참조 구현)와 비교하는 시드 고정 회귀 테스트.
+
+솔버는 SWAR 열 검사, 충돌 기반 백점프, 마지막 행 해시 조회에 기대므로
+패킹/점프/조회 불변식이 깨지면 여기서 해 개수나 칸별 확률이 어긋난다.
+"""
+import os
+import random
+import sys
+import unittest
+from itertools import product
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import voltorb  # noqa: E402
+
+N = voltorb.N
+
+
+def _random_board(rng):
+    g = [[rng.choices((0, 1, 2, 3), (0.24, 0.56, 0.12, 0.08))[0] for _ in range(N)] for _ in range(N)]
+    row_sums = [sum(row) for row in g]
+    row_bombs = [row.count(0) for row in g]
+    col_sums = [sum(g[r][c] for r in range(N)) for c in range(N)]
+    col_bombs = [sum(g[r][c] == 0 for r in range(N)) for c in range(N)]
+    return g, row_sums, row_bombs, col_sums, col_bombs
+
+
+def _cases(seed, n, n_open):
+    """(row_sums, row_bombs, col_sums, col_bombs, opened) 목록. 일부는 일부러 모순된 칸을 연다."""
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        g, rs, rb, cs, cb = _random_board(rng)
+        cells = rng.sample([(r, c) for r in range(N) for c in range(N)], rng.choice(n_open))
+        opened = {(r, c): g[r][c] for r, c in cells}
+        if i % 3 == 2 and cells:
+            opened[cells[0]] = (opened[cells[0]] + 1) % 4
+        out.append((rs, rb, cs, cb, opened))
+    return out
+
+
+def _reference_posteriors(row_sums, row_bombs, col_sums, col_bombs, opened):
+    """행 단위 단순 전수 + 열 누적 상한 검사만 하는 참조 구현 (compute_posteriors와 같은 반환 형식)."""
+    rows = []
+    for r in range(N):
+        rows.append([
+            pat for pat in product(range(4), repeat=N)
+            if sum(pat) == row_sums[r] and pat.count(0) == row_bombs[r]
+            and all(opened.get((r, c), pat[c]) == pat[c] for c in range(N))
+        ])
+    counts = {(r, c): [0] * 4 for r in range(N) for c in range(N) if (r, c) not in opened}
+    nsol = 0
+    chosen = []
+
+    def dfs(r, col_sum, col_bz):
+        nonlocal nsol
+        if r == N:
+            if col_sum == list(col_sums) and col_bz == list(col_bombs):
+                nsol += 1
+                for rr, pat in enumerate(chosen):
+                    for c in range(N):
+                        if (rr, c) in counts:
+                            counts[(rr, c)][pat[c]] += 1
+            return
+        for pat in rows[r]:
+            s = [col_sum[c] + pat[c] for c in range(N)]
+            z = [col_bz[c] + (pat[c] == 0) for c in range(N)]
+            if any(s[c] > col_sums[c] or z[c] > col_bombs[c] for c in range(N)):
+                continue
+            chosen.append(pat)
+            dfs(r + 1, s, z)
+            chosen.pop()
+
+    dfs(0, [0] * N, [0] * N)
+    if not nsol:
+        return {}, 0
+    post = {}
+    for (r, c), d in counts.items():
+        tot = sum(d)
+        if tot == 0:
+            continue
+        ev = (1*d[1] + 2*d[2] + 3*d[3]) / tot
+        post[(r, c)] = {"total": tot, "p": {v: d[v] / tot for v in range(4)}, "ev": ev}
+    return post, nsol
+
+
+class CompareWithReference(unittest.TestCase):
+    def test_opened_cells(self):
+        for case in _cases(seed=1, n=30, n_open=(3, 6, 10, 15)):
+            with self.subTest(case=case):
+                self.assertEqual(voltorb.compute_posteriors(*case), _reference_posteriors(*case))
+
+    def test_fully_closed(self):
+        for case in _cases(seed=2, n=4, n_open=(0,)):
+            with self.subTest(case=case):
+                self.assertEqual(voltorb.compute_posteriors(*case), _reference_posteriors(*case))
+
+
+if __name__ == "__main__":
+    unittest.main()
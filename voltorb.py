@@ -1,6 +1,8 @@
 
 
 from __future__ import annotations
+from functools import lru_cache
+from itertools import combinations, product
 from typing import Dict, List, Tuple, Optional
 
 # ============================================================================
@@ -17,17 +19,19 @@ from typing import Dict, List, Tuple, Optional
 #    - 각 행은 5칸이며, 각 칸은 0(폭탄), 1,2,3 중 하나.
 #    - 행 합(row_sums)과 행 폭탄(row_bombs), 그리고 이미 열린 칸(opened)을 고려해
 #      그 행 내부에서 가능한 모든 길이-5 패턴을 생성한다.
-#    - 행 내부 열거는 DFS(백트래킹)로 구현되며, 남은 합(rem_sum)과 남은 폭탄(rem_bombs)
-#      에 대한 하한/상한으로 가지치기(prune)합니다.
+#    - 행 내부 열거는 "폭탄 위치 조합 x 남은 합의 1..3 합성(COMPOSITIONS)"의 곱으로
+#      바로 생성하며, (R, Z, 열린 칸) 키로 캐시됩니다.
 #
 # 2) 행 패턴들로부터 전체 보드를 백트래킹으로 조합하면서 열 제약으로 추가 프루닝.
 #    - 각 행에 대해 사전 생성한 패턴 후보들 중 하나를 선택해 그 행을 채우고,
 #      누적 열 합(col_sum)과 누적 열 폭탄(col_bz)을 갱신합니다.
-#    - 각 열에 대해 앞으로 남은(미할당) 행 수를 계산하고, _col_bounds_so_far로
-#      해당 열의 최종 합과 폭탄수가 가능한지 확인하여 불필요한 분기를 제거합니다.
+#    - 5열의 누적/목표/남은 행 수를 6비트 레인 정수(SWAR)로 묶어, 각 열의 최종 합과
+#      폭탄수가 아직 가능한지를 정수 연산 몇 번으로 한꺼번에 검사해 분기를 제거합니다.
+#      (_col_bounds_so_far는 같은 검사의 열 단위 버전으로, DEBUG 출력에만 쓰입니다.)
+#    - 마지막 행은 탐색하지 않고, 남은 열 차이를 키로 그 행 패턴 묶음을 해시 조회합니다.
 #
-# 3) 가능한 모든 완전한 보드(열 제약까지 만족)를 모아 숙고한 후
-#    미확정 칸별로 값 등장 빈도에서 사후확률(posteriors)과 기대값을 계산합니다.
+# 3) 가능한 모든 완전한 보드(열 제약까지 만족)를 목록으로 모으지 않고 탐색 중에 바로
+#    미확정 칸별 값 등장 빈도를 집계해 사후확률(posteriors)과 기대값을 계산합니다.
 #
 # 성능 유의점:
 # - 행 패턴을 미리 생성하면 행 선택 순서에 따른 중복 계산을 줄일 수 있음.
@@ -45,12 +49,46 @@ from typing import Dict, List, Tuple, Optional
 N = 5
 Val = int
 Coord = Tuple[int, int]
-Grid = List[List[Val]]
+OpenedArr = Tuple[Tuple[Val, ...], ...]
+
+# opened_arr에서 아직 열리지 않은 칸 표시
+UNOPENED = -1
 
 # debug flag
 DEBUG = False
 OPTIONS = True
 
+# 열 누적용 SWAR 패킹: 5열 값을 6비트 레인 하나씩에 담은 정수 하나로 다룬다.
+# 레인 값은 항상 0..31(열 합 <= 15, 폭탄 <= 5)이므로 각 레인의 최상위(가드) 비트를
+# 이용해 5열 비교를 정수 연산 몇 번으로 끝낼 수 있다.
+LANE_BITS = 6
+PACK_SHIFT = tuple(LANE_BITS * c for c in range(N))
+LANE_MASK = (1 << LANE_BITS) - 1
+LANE_GUARD = sum(1 << (s + LANE_BITS - 1) for s in PACK_SHIFT)
+PACK_BITS = LANE_BITS * N
+
+def _pack(vals) -> int:
+    return sum(v << s for v, s in zip(vals, PACK_SHIFT))
+
+def _unpack(packed: int) -> Tuple[int, ...]:
+    return tuple((packed >> s) & LANE_MASK for s in PACK_SHIFT)
+
+def _pack_row(row: Tuple[Val, ...]) -> Tuple[int, int]:
+    """opened_arr 한 행의 (열린 값 합, 열린 폭탄) 기여를 패킹 (UNOPENED 칸은 0)"""
+    return (_pack(0 if v == UNOPENED else v for v in row),
+            _pack(1 if v == 0 else 0 for v in row))
+
+# 합성 테이블: COMPOSITIONS[(칸 수, 합)] = 각 칸이 1..3인 순서 있는 분할들
+# (칸 수 0..N, 합 0..3N 범위라 모듈 로드 시 한 번에 만들어 둔다)
+def _build_compositions() -> Dict[Tuple[int, int], Tuple[Tuple[Val, ...], ...]]:
+    table: Dict[Tuple[int, int], List[Tuple[Val, ...]]] = {}
+    for n in range(N + 1):
+        for comp in product((1, 2, 3), repeat=n):
+            table.setdefault((n, sum(comp)), []).append(comp)
+    return {key: tuple(comps) for key, comps in table.items()}
+
+COMPOSITIONS = _build_compositions()
+
 # ---------------------------
 # 열 프루닝용 보조 (부분 누적 -> 가능한 합 구간)
 # ---------------------------
@@ -74,184 +112,326 @@ def _col_bounds_so_far(target_sum, target_bombs, partial_sum, partial_bombs, row
     max_possible = partial_sum + max_add
     return min_possible, max_possible
 
+def _debug_col_failure(r, col_sums, col_bombs, partial_sums, partial_bombs, rows_left):
+    """DEBUG 전용: 열 프루닝에 걸린 첫 열과 사유를 출력 (핫패스에서는 호출되지 않음)"""
+    for c in range(N):
+        bnd = _col_bounds_so_far(col_sums[c], col_bombs[c], partial_sums[c], partial_bombs[c], rows_left[c])
+        if bnd is None:
+            print(f"[r={r}] 열{c} 폭탄수 불가 (partial_bombs={partial_bombs[c]}, target={col_bombs[c]}, rows_left={rows_left[c]})")
+            return
+        lo, hi = bnd
+        if not (lo <= col_sums[c] <= hi):
+            print(f"[r={r}] 열{c} 합 불가: target={col_sums[c]}, 가능[{lo},{hi}] (partial_sum={partial_sums[c]}, rows_left={rows_left[c]})")
+            return
+
 # ---------------------------
 # 유틸
 # ---------------------------
-def _row_remaining(r: int, row_sums, row_bombs, opened: Dict[Coord, Val]) -> Tuple[int,int,int,List[int]]:
-    """행 r의 남은 합 R, 남은 폭탄 Z, 미확정 칸 수 k, 미확정 열 인덱스 cs"""
-    S = sum(v for (rr, cc), v in opened.items() if rr == r)
-    Z_open = sum(1 for (rr, cc), v in opened.items() if rr == r and v == 0)
+def _opened_to_array(opened: Dict[Coord, Val]) -> OpenedArr:
+    """인터랙티브 층의 opened dict -> 솔버 내부용 5x5 조밀 배열 (미개봉 = UNOPENED)"""
+    return tuple(tuple(opened.get((r, c), UNOPENED) for c in range(N)) for r in range(N))
+
+def _row_remaining(r: int, row_sums, row_bombs, opened_arr: OpenedArr) -> Tuple[int, int]:
+    """행 r의 남은 합 R, 남은 폭탄 Z (미확정 칸 위치는 행 패턴 캐시가 row_fixed에서 직접 구한다)"""
+    row = opened_arr[r]
+    # 열린 값은 0..3, 미확정은 UNOPENED(-1): 양수만 더하면 열린 합, 0의 개수가 열린 폭탄 수
+    S = sum(v for v in row if v > 0)
+    Z_open = row.count(0)
     R = row_sums[r] - S
     Z = row_bombs[r] - Z_open
-    cs = [c for c in range(N) if (r, c) not in opened]
-    return R, Z, len(cs), cs
+    return R, Z
 
 # ---------------------------
 # 행 패턴 전수 (행 내부 제약만)
 # ---------------------------
-def _enumerate_row_patterns(r: int, row_sums, row_bombs, col_sums, col_bombs,
-                            opened: Dict[Coord, Val]) -> List[List[Val]]:
+@lru_cache(maxsize=None)
+def _enum_row_patterns_cached(R: int, Z: int, row_fixed: Tuple[Val, ...]) -> Tuple[Tuple[Val, ...], ...]:
     """
-    주어진 행 r에 대해 행 내부 제약(행 합, 행 폭탄 수, 이미 열린 칸)만을 만족하는
-    가능한 길이-N 패턴들을 모두 반환.
+    (남은 합 R, 남은 폭탄 Z, 열린 칸 튜플)만으로 결정되는 순수 함수.
+    인터랙티브 루프에서 compute_posteriors를 반복 호출해도 바뀌지 않은 행은
+    캐시에서 그대로 재사용된다 (반환값은 불변 튜플).
     """
-    R, Z, k, cs = _row_remaining(r, row_sums, row_bombs, opened)
-
-    patterns: List[List[Val]] = []
-    row_fixed = [opened.get((r, c)) for c in range(N)]
-
-    def dfs(c: int, rem_sum: int, rem_bombs: int, acc: List[int]):
-        # count how many unfixed (to-be-assigned) columns remain from c..N-1
-        cols_unfixed_left = sum(1 for i in range(c, N) if row_fixed[i] is None)
-        # infeasible bomb count
-        if rem_bombs < 0 or rem_bombs > cols_unfixed_left:
-            return
-        # feasible sum range for remaining unfixed non-bomb slots
-        nonbomb_slots = cols_unfixed_left - rem_bombs
-        min_possible = nonbomb_slots * 1
-        max_possible = nonbomb_slots * 3
-        if rem_sum < min_possible or rem_sum > max_possible:
-            return
-
-        if c == N:
-            if rem_sum == 0 and rem_bombs == 0:
-                patterns.append(acc.copy())
-            return
-
-        fixed = row_fixed[c]
-        if fixed is not None:
-            # already opened/fixed cell: it's already accounted in R/Z, so do NOT subtract again
-            v = fixed
-            dfs(c+1, rem_sum, rem_bombs, acc + [v])
-        else:
-            # try bomb (0) if possible
-            if rem_bombs > 0:
-                dfs(c+1, rem_sum, rem_bombs-1, acc + [0])
-            # try non-bomb values 1..3
-            for v in (1, 2, 3):
-                new_rem_sum = rem_sum - v
-                # one fewer unfixed column after placing v
-                new_cols_unfixed = cols_unfixed_left - 1
-                # bombs remaining unchanged in this branch
-                b_left = rem_bombs
-                nonbomb_slots_after = new_cols_unfixed - b_left
-                min_p = max(0, nonbomb_slots_after) * 1
-                max_p = max(0, nonbomb_slots_after) * 3
-                if new_rem_sum < min_p or new_rem_sum > max_p:
-                    continue
-                dfs(c+1, new_rem_sum, b_left, acc + [v])
-
-    dfs(0, R, Z, [])
-    return patterns
+    # 행 패턴 = (미확정 칸 중 폭탄 Z개 위치 선택) x (남은 칸에 R을 1..3으로 나누는 합성)
+    # 두 조합 구조가 서로 독립이므로 DFS 없이 곱으로 바로 생성한다.
+    cs = [c for c in range(N) if row_fixed[c] == UNOPENED]
+    k = len(cs)
+    if Z < 0 or Z > k:
+        return ()
+    comps = COMPOSITIONS.get((k - Z, R), ())
+    if not comps:
+        return ()
+
+    base = [0 if v == UNOPENED else v for v in row_fixed]
+    patterns: List[Tuple[Val, ...]] = []
+    for bomb_cols in combinations(cs, Z):
+        # 폭탄 칸은 base에서 이미 0이므로 비폭탄 칸만 채운다
+        free_cols = [c for c in cs if c not in bomb_cols]
+        for comp in comps:
+            buf = base.copy()
+            for c, v in zip(free_cols, comp):
+                buf[c] = v
+            patterns.append(tuple(buf))
+    return tuple(patterns)
+
+@lru_cache(maxsize=None)
+def _row_tables(R: int, Z: int, row_fixed: Tuple[Val, ...]) -> Tuple[Tuple[Tuple[Val, ...], ...],
+                                                                   Tuple[int, ...], Tuple[int, ...]]:
+    """
+    행 패턴과 패턴별 SWAR 패킹 기여분(열 합, 폭탄; 이미 열린 칸 제외)을 함께 반환.
+    (R, Z, 열린 칸)이 같은 행들은 한 보드 안에서든 턴 사이에서든 같은 객체를 공유한다.
+    """
+    pats = _enum_row_patterns_cached(R, Z, row_fixed)
+    # 기여분 = 패턴 전체 - 이미 열린 칸 몫. 열린 칸에서는 패턴 값이 곧 열린 값이라 레인 차가 0이다.
+    fixed_sum, fixed_bz = _pack_row(row_fixed)
+    sum_deltas = tuple(_pack(pat) - fixed_sum for pat in pats)
+    bomb_deltas = tuple(_pack(1 if v == 0 else 0 for v in pat) - fixed_bz for pat in pats)
+    return pats, sum_deltas, bomb_deltas
 
 # ---------------------------
 # 전체 보드 전수(행 단위 백트래킹 + 열 프루닝)
 # ---------------------------
-def _enumerate_all_boards(row_sums, row_bombs, col_sums, col_bombs, opened: Dict[Coord, Val]) -> List[Grid]:
-    # 각 행의 가능한 패턴 미리 생성
-    all_row_patterns: List[List[List[Val]]] = []
+def _enumerate_all_boards(row_sums, row_bombs, col_sums, col_bombs, opened_arr: OpenedArr,
+                          counts: List[List[List[int]]]) -> int:
+    """
+    가능한 모든 보드를 전수하되 보드 목록은 만들지 않고 NxNx4 조밀 배열
+    counts[r][c][값]에 바로 누적한다 (미확정 칸만). 반환: 해의 개수.
+    """
+    # 각 행의 가능한 패턴과 SoA 기여분: 패턴별 열 합/폭탄 기여(이미 열린 칸 제외)를
+    # 5열짜리 SWAR 정수 하나로 미리 패킹 -> 적용은 정수 덧셈 한 번.
+    # 같은 제약의 행은 캐시에서 같은 테이블을 받는다.
+    all_row_patterns: List[Tuple[Tuple[Val, ...], ...]] = []
+    pat_sum_delta: List[Tuple[int, ...]] = []
+    pat_bomb_delta: List[Tuple[int, ...]] = []
     for r in range(N):
-        pats = _enumerate_row_patterns(r, row_sums, row_bombs, col_sums, col_bombs, opened)
+        R, Z = _row_remaining(r, row_sums, row_bombs, opened_arr)
+        pats, sum_deltas, bomb_deltas = _row_tables(R, Z, opened_arr[r])
         if not pats:
             if DEBUG: print(f"❌ 행 {r} 단계에서 전개 불가 (행 패턴 0)")
-            return []
+            return 0
         all_row_patterns.append(pats)
+        pat_sum_delta.append(sum_deltas)
+        pat_bomb_delta.append(bomb_deltas)
+
+    # 목표 열 합/폭탄이 레인 폭을 벗어나면 어차피 물리적으로 불가능한 입력
+    if not all(0 <= ts <= 3 * N for ts in col_sums) or not all(0 <= tb <= N for tb in col_bombs):
+        if DEBUG: print("❌ 열 합/폭탄 목표가 범위를 벗어남")
+        return 0
+
+    # 열 누적 (이미 열린 값 반영)과 목표치를 같은 레인 배치로 패킹
+    fixed = [_pack_row(row) for row in opened_arr]
+    col_sum0 = sum(fs for fs, fb in fixed)
+    col_bz0 = sum(fb for fs, fb in fixed)
+
+    # fail-first: 패턴 수가 적은(가장 제약이 강한) 행부터 채워 트리 상단의 분기 수를 줄인다.
+    # 열 순서는 그대로이고 행 순회 순서만 바뀐다.
+    order = sorted(range(N), key=lambda r: len(all_row_patterns[r]))
+
+    # rows_left[i] = 레벨 i 다음(i+1..N-1)에 채울 행들 중 열별 미확정 칸 수.
+    # 전수 중에는 opened가 바뀌지 않으므로 뒤에서부터 한 번만 누적해 둔다.
+    rows_left = [0] * N
+    for i in range(N - 2, -1, -1):
+        rows_left[i] = rows_left[i + 1] + _pack(1 if v == UNOPENED else 0 for v in opened_arr[order[i + 1]])
+
+    # 충돌 기반 백점프(CBJ)용: level_cols[c] = 열 c에 미확정 칸이 있는(=열 c 누적을 바꾸는) 레벨 비트마스크
+    level_cols = [0] * N
+    for i, r in enumerate(order):
+        for c in range(N):
+            if opened_arr[r][c] == UNOPENED:
+                level_cols[c] |= 1 << i
+    # fail_conf[i][가드비트] = 레벨 i에서 그 레인(열)이 프루닝에 걸렸을 때 책임이 있는 위쪽 레벨 집합
+    fail_conf = [{1 << (PACK_SHIFT[c] + LANE_BITS - 1): level_cols[c] & ((1 << i) - 1) for c in range(N)}
+                 for i in range(N)]
+
+    nsol, pat_weight = _search_kernel([pat_sum_delta[r] for r in order], [pat_bomb_delta[r] for r in order],
+                                      rows_left, fail_conf, col_sum0, col_bz0,
+                                      _pack(col_sums), _pack(col_bombs), order)
+
+    # 패턴별 가중치 -> 칸별 값 빈도 (행마다 패턴 수 x 5칸만큼만 갱신)
+    for i, r in enumerate(order):
+        row_counts = counts[r]
+        cells = [c for c in range(N) if opened_arr[r][c] == UNOPENED]
+        for pat, w in zip(all_row_patterns[r], pat_weight[i]):
+            if w:
+                for c in cells:
+                    row_counts[c][pat[c]] += w
+
+    if not nsol and DEBUG:
+        print("❌ 보드 전개 결과: 해 0개")
+    return nsol
 
-    solutions: List[Grid] = []
-
-    # 열 누적 (이미 열린 값 반영)
-    col_sum = [sum(opened.get((r, c), 0) for r in range(N)) for c in range(N)]
-    col_bz = [sum(1 for r in range(N) if opened.get((r, c)) == 0) for c in range(N)]
+def _search_kernel(lv_sum_delta: List[Tuple[int, ...]], lv_bomb_delta: List[Tuple[int, ...]], lv_rows_left: List[int],
+                   fail_conf: List[Dict[int, int]], col_sum0: int, col_bz0: int,
+                   target_sum: int, target_bz: int, order: List[int]) -> Tuple[int, List[List[int]]]:
+    """
+    행 단위 백트래킹 본체. 레벨(=채우는 순서) 기준으로 정렬된 패킹 테이블과 정수만 받아
+    (해의 개수, 레벨별 패턴 가중치)를 돌려준다. 전역/클로저 조회 없이 지역 변수만으로
+    도는 단일 루프이며, 마지막 레벨은 탐색 대신 사전 조회로 처리한다.
+    order는 DEBUG 출력에만 쓴다.
+    """
+    guard = LANE_GUARD
+    debug = DEBUG
+    target_sum_g = target_sum | guard
+    target_bz_g = target_bz | guard
+    # 모든 열의 책임 집합이 '위쪽 레벨 전부'인 레벨은 백점프가 불가능하므로 기록을 생략 (열린 칸이 없을 때 등)
+    full_conf = [(1 << i) - 1 for i in range(N)]
+    cbj_track = [any(m != full_conf[i] for m in fail_conf[i].values()) for i in range(N)]
+
+    # 부분합 집계: 리프마다 25칸을 세지 않고, 패턴별로 "그 패턴 아래에서 완성된 보드 수"만
+    # 누적한다. below[i] = 레벨 i의 현재 패턴 아래에서 지금까지 찾은 해 수.
+    # 패턴을 떠날 때 pat_weight[i][p]에 반영하고 부모의 below로 올려 보낸다.
+    n_pats = [len(deltas) for deltas in lv_sum_delta]
+    pat_weight = [[0] * n for n in n_pats]
+    below = [0] * N
+    nsol = 0
+
+    # 마지막 레벨(tail)은 탐색하지 않고 조회한다: 그 행 패턴의 (열 합 기여 | 폭탄 기여 << PACK_BITS)
+    # 키 -> 같은 기여를 갖는 패턴 묶음. 바로 위 레벨(leaf)에서 남은 차이를 키로 만들어 한 번에 찾는다.
+    tail = N - 1
+    tail_group: Dict[int, int] = {}
+    tail_members: List[List[int]] = []
+    for q, (ds, db) in enumerate(zip(lv_sum_delta[tail], lv_bomb_delta[tail])):
+        g = tail_group.setdefault(ds | (db << PACK_BITS), len(tail_members))
+        if g == len(tail_members):
+            tail_members.append([])
+        tail_members[g].append(q)
+    tail_size = [len(m) for m in tail_members]
+    tail_hits = [0] * len(tail_members)
+
+    # 레벨(행 순서 i)별 상태: 적용 전 열 누적/폭탄, 다음 패턴 인덱스, 충돌 집합
+    lv_sum = [0] * N
+    lv_bz = [0] * N
+    lv_next = [0] * N
+    conf = [0] * N
+    lv_sum[0], lv_bz[0] = col_sum0, col_bz0
+
+    # tail 바로 위(마지막으로 탐색하는) 레벨은 패턴 기여도 같은 키 형태로 만들어 둔다
+    leaf = tail - 1
+    leaf_keys = [ds | (db << PACK_BITS) for ds, db in zip(lv_sum_delta[leaf], lv_bomb_delta[leaf])]
+
+    i = 0
+    while True:
+        col_sum = lv_sum[i]
+        col_bz = lv_bz[i]
+        descended = False
+        if i == leaf:
+            # 열 범위 검사 없이 바로 조회: 키 = 남은 차이 - 이 패턴 기여. 어느 레인이든 음수가 되면
+            # 그 레인은 빌림으로 49 이상(폭탄 레인은 63)이 되거나 키 전체가 음수가 되는데,
+            # tail 패턴 키의 레인은 합 <= 15, 폭탄 <= 1이라 절대 맞지 않는다.
+            # 즉 조회 자체가 최종 열 제약(합/폭탄 일치) 검사를 겸한다.
+            leaf_weight = pat_weight[i]
+            rem_key = (target_sum - col_sum) | ((target_bz - col_bz) << PACK_BITS)
+            n_found = 0
+            for p in range(lv_next[i], n_pats[i]):
+                g = tail_group.get(rem_key - leaf_keys[p])
+                if g is not None:
+                    k = tail_size[g]
+                    tail_hits[g] += 1
+                    leaf_weight[p] += k
+                    n_found += k
+                elif debug:
+                    print(f"[r={order[i]}] 마지막 행 {order[tail]}에 맞는 패턴 없음")
+            # 조회 실패는 책임 레벨을 좁힐 수 없으므로 위 레벨 전부를 충돌 집합으로 (시간순 백트래킹)
+            cs = full_conf[i]
+            if n_found:
+                nsol += n_found
+                below[i - 1] += n_found
+                # 해를 찾은 경로 위에서는 백점프 금지 (모든 위 레벨로 충돌 집합 확장 -> 시간순 백트래킹)
+                conf[:] = full_conf
+        else:
+            sum_deltas = lv_sum_delta[i]
+            bomb_deltas = lv_bomb_delta[i]
+            # 레벨 진입 시 한 번: 목표 폭탄 - 현재 폭탄 (가드 포함). 패턴마다 뺄셈 한 번으로 bl을 얻는다.
+            bz_rem_g = target_bz_g - col_bz
+            # 이 행 다음으로 남은(미할당) 행들 중 열별 미확정 칸 수 (미리 계산된 표)
+            rows_left = lv_rows_left[i]
+            rows_left_g = rows_left | guard
+            lv_fail_conf = fail_conf[i]
+            track = cbj_track[i] or debug
+            cs = conf[i] if cbj_track[i] else full_conf[i]
+            for p in range(lv_next[i], n_pats[i]):
+                # 열 프루닝 (_col_bounds_so_far를 5열 SWAR로 옮긴 형태)
+                #   bl = target_bombs - partial_bombs >= 0,  nb = rows_left - bl >= 0
+                #   partial_sum + nb <= target_sum <= partial_sum + 3*nb
+                # (a|GUARD) - b 의 가드 비트가 남아 있으면 그 레인에서 a >= b
+                x = bz_rem_g - bomb_deltas[p]
+                good = x & guard
+                if good == guard:
+                    y = rows_left_g - (x ^ guard)
+                    good = y & guard
+                    if good == guard:
+                        nb = y ^ guard
+                        # 패턴 적용: 5열 동시 덧셈 (폭탄 단계를 통과한 패턴만)
+                        new_sum = col_sum + sum_deltas[p]
+                        lo = new_sum + nb
+                        good = (target_sum_g - lo) & (((lo + 2 * nb) | guard) - target_sum) & guard
+                        if good == guard:
+                            descended = True
+                            break
+                if track:
+                    # 걸린 열(가장 낮은 실패 레인)에 기여한 위쪽 레벨들만 충돌 집합에 추가
+                    bad = guard ^ good
+                    cs |= lv_fail_conf[bad & -bad]
+                    if debug:
+                        _debug_col_failure(order[i], _unpack(target_sum), _unpack(target_bz),
+                                           _unpack(col_sum + sum_deltas[p]), _unpack(col_bz + bomb_deltas[p]),
+                                           _unpack(rows_left))
+
+        if descended:
+            lv_next[i] = p + 1
+            conf[i] = cs
+            i += 1
+            lv_sum[i], lv_bz[i] = new_sum, col_bz + bomb_deltas[p]
+            lv_next[i] = 0
+            conf[i] = 0
+            continue
 
-    grid: List[List[Optional[int]]] = [[opened.get((r, c)) for c in range(N)] for r in range(N)]
+        # 레벨 소진: 충돌 집합에서 가장 깊은 레벨로 바로 점프 (사이 레벨들은 고쳐 줄 수 없음)
+        h = cs.bit_length() - 1
+        # 점프로 닫히는 레벨들(i-1..h, 탐색 종료면 전부)의 현재 패턴에 아래에서 찾은 해 수를 반영
+        for j in range(i - 1, (h if h > 0 else 0) - 1, -1):
+            w = below[j]
+            if w:
+                pat_weight[j][lv_next[j] - 1] += w
+                if j:
+                    below[j - 1] += w
+                below[j] = 0
+        if h < 0:
+            break
+        conf[h] |= cs & ~(1 << h)
+        i = h
 
-    def dfs_row(r: int):
-        if r == N:
-            # 최종 열 제약 일치해야 정답
-            for c in range(N):
-                if col_sum[c] != col_sums[c] or col_bz[c] != col_bombs[c]:
-                    return
-            solutions.append([[int(x) for x in row] for row in grid]) # type: ignore
-            return
+    # tail 묶음별 적중 횟수 -> tail 패턴 가중치
+    tail_weight = pat_weight[tail]
+    for members, hits in zip(tail_members, tail_hits):
+        if hits:
+            for q in members:
+                tail_weight[q] += hits
 
-        for row_pat in all_row_patterns[r]:
-            ok = True
-            incr_sum = [0]*N
-            incr_bz = [0]*N
-
-            # 현재 행에 패턴 적용 가능 여부
-            for c in range(N):
-                v = row_pat[c]
-                prev = grid[r][c]
-                if prev is not None and prev != v:
-                    ok = False; break
-                incr_sum[c] = v - (prev or 0)
-                incr_bz[c] = (1 if v == 0 else 0) - (1 if (prev == 0) else 0)
-
-            if not ok:
-                continue
-
-            for c in range(N):
-                grid[r][c] = row_pat[c]
-                col_sum[c] += incr_sum[c]
-                col_bz[c] += incr_bz[c]
-
-            # 열 프루닝: 각 열별로 남은(미할당) 행 수 기준으로 최종 가능 합 구간 체크
-            for c in range(N):
-                # 앞으로 할당할 행들 중 이 열의 미확정(=None) 칸 수만 셈
-                rows_left = sum(1 for rr in range(r+1, N) if grid[rr][c] is None)
-                bnd = _col_bounds_so_far(col_sums[c], col_bombs[c], col_sum[c], col_bz[c], rows_left)
-                if bnd is None:
-                    ok = False
-                    if DEBUG: print(f"[r={r}] 열{c} 폭탄수 불가 (partial_bombs={col_bz[c]}, target={col_bombs[c]}, rows_left={rows_left})")
-                    break
-                lo, hi = bnd
-                if not (lo <= col_sums[c] <= hi):
-                    ok = False
-                    if DEBUG: print(f"[r={r}] 열{c} 합 불가: target={col_sums[c]}, 가능[{lo},{hi}] (partial_sum={col_sum[c]}, rows_left={rows_left})")
-                    break
-
-            if ok:
-                dfs_row(r + 1)
-
-            # 롤백
-            for c in range(N):
-                col_sum[c] -= incr_sum[c]
-                col_bz[c] -= incr_bz[c]
-                grid[r][c] = opened.get((r, c))
-
-    dfs_row(0)
-    if not solutions and DEBUG:
-        print("❌ 보드 전개 결과: 해 0개")
-    return solutions
+    return nsol, pat_weight
 
 # ---------------------------
 # 사후확률/기대값 계산
 # ---------------------------
 def compute_posteriors(row_sums, row_bombs, col_sums, col_bombs, opened: Dict[Coord, Val]):
-    sols = _enumerate_all_boards(row_sums, row_bombs, col_sums, col_bombs, opened)
-    if not sols:
+    opened_arr = _opened_to_array(opened)
+    targets = [(r, c) for r in range(N) for c in range(N) if opened_arr[r][c] == UNOPENED]
+    # counts[r][c][v]: 칸 (r,c)가 값 v인 보드 수 (튜플 키 중첩 dict 대신 조밀 배열)
+    counts = [[[0] * 4 for _ in range(N)] for _ in range(N)]
+
+    # 보드 목록을 만들지 않고 전수 중에 바로 집계
+    nsol = _enumerate_all_boards(row_sums, row_bombs, col_sums, col_bombs, opened_arr, counts)
+    if not nsol:
         return {}, 0
 
-    targets = [(r, c) for r in range(N) for c in range(N) if (r, c) not in opened]
-    counts = {rc: {0:0, 1:0, 2:0, 3:0} for rc in targets}
-
-    for g in sols:
-        for (r, c) in targets:
-            counts[(r, c)][ g[r][c] ] += 1
-
     post = {}
-    for rc, d in counts.items():
-        tot = sum(d.values())
+    for (r, c) in targets:
+        d = counts[r][c]
+        tot = d[0] + d[1] + d[2] + d[3]
         if tot == 0:
             continue
-        p0 = d[0] / tot
-        p1 = d[1] / tot
-        p2 = d[2] / tot
-        p3 = d[3] / tot
-        ev = 1*p1 + 2*p2 + 3*p3
-        post[rc] = {"total": tot, "p": {0:p0, 1:p1, 2:p2, 3:p3}, "ev": ev}
-    return post, len(sols)
+        ev = (1*d[1] + 2*d[2] + 3*d[3]) / tot
+        post[(r, c)] = {"total": tot, "p": {v: d[v] / tot for v in range(4)}, "ev": ev}
+    return post, nsol
 
 
 # ---------------------------